@@ -1,21 +1,54 @@
+import asyncio
+import aiohttp
+import email.utils
+import os
 import requests
-import xml.etree.ElementTree as ET
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree
 import re
 import sys
-import time
-from datetime import datetime, timedelta
-from collections import defaultdict
+from io import BytesIO
+from datetime import datetime, timedelta, timezone
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+import hashlib
+import heapq
 import json
+import zlib
+import orjson
+from dataclasses import dataclass
+from pathlib import Path
 
 # --- Configuration Imports ---
-# PULLS: DASHBOARD_API_KEY, SEC_USER_AGENT, API_ENDPOINT
-from config import DASHBOARD_API_KEY, SEC_USER_AGENT, API_ENDPOINT
+# PULLS: DASHBOARD_API_KEY, SEC_USER_AGENT, API_ENDPOINT, SEC_CACHE_DIR
+from config import DASHBOARD_API_KEY, SEC_USER_AGENT, API_ENDPOINT, SEC_CACHE_DIR
 
 # --- Configuration for SEC Scraper ---
 HEADERS = {
     'User-Agent': SEC_USER_AGENT
 }
-REQUEST_DELAY = 0.15 # Adhere to SEC rate limits
+# Adhere to SEC rate limits (no more than 10 requests per second)
+MAX_REQUESTS_PER_SECOND = 10
+MAX_CONCURRENT_REQUESTS = 10
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0 # Seconds; doubled on every retry when the server gives no Retry-After
+# Statuses the SEC uses to signal throttling or temporary unavailability
+RETRYABLE_STATUSES = {429, 503}
+
+# Shared HTTP session for the index download and dashboard upload: keeps TCP/TLS
+# connections alive between calls and retries transient SEC errors with backoff.
+# (requests already sends Accept-Encoding: gzip, deflate by default.)
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_RETRY_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+)
+_SESSION.mount('https://', _RETRY_ADAPTER)
+_SESSION.mount('http://', _RETRY_ADAPTER)
 
 # SMART FILTER: Focus on discretionary trades with high informational value.
 TARGET_CODES = ['P', 'S', 'M', 'X', 'V'] # P=Purchase, S=Sale, M/X=Exercise/Conversion, V=Volunteer Filing
@@ -26,9 +59,115 @@ VALUE_CODES = ['P', 'S']
 MIN_TRADE_VALUE = 1000000.00 # $1,000,000.00
 MEGA_TRADE_THRESHOLD = 10000000.00 # $10,000,000.00
 
+# Number of highest-value trades shown in the console report
+REPORT_TOP_N = 20
+
 # NOTE: MAX_FILING_COUNT has been removed to pull all trades for the target day.
 
-NAMESPACE = '{http://www.sec.gov/edgar/v1}'
+# master.idx rows are CIK|Company Name|Form Type|Date Filed|Filename; this captures
+# the Filename of Form 4 rows in one C-level match (only two fields follow the form type).
+FORM4_INDEX_LINE = re.compile(rb"\|4\|[^|]*\|([^|\r\n]+)$")
+# Read size while streaming the (multi-MB) index; requests' default of 512 bytes is tiny
+INDEX_CHUNK_SIZE = 64 * 1024
+
+# --- Precompiled XPath Expressions ---
+EDGAR_NAMESPACE = 'http://www.sec.gov/edgar/v1'
+
+def compile_transaction_xpaths(step, namespaces=None):
+    """
+    Compiles the per-transaction field lookups, where step(tag) renders a single
+    location step for one namespace flavour (plain name, prefixed name or local-name()).
+    """
+    return {
+        'transactionCode': etree.XPath(f".//{step('transactionCode')}/text()", namespaces=namespaces),
+        # The date and the amounts all live in an inner <value> tag
+        'transactionDate': etree.XPath(f".//{step('transactionDate')}/{step('value')}/text()", namespaces=namespaces),
+        'transactionShares': etree.XPath(f".//{step('transactionShares')}/{step('value')}/text()", namespaces=namespaces),
+        'transactionPricePerShare': etree.XPath(f".//{step('transactionPricePerShare')}/{step('value')}/text()", namespaces=namespaces),
+    }
+
+# A filing uses one namespace throughout, so it is detected once per document and
+# the matching specialized lookups are used: plain name tests are matched directly
+# by libxml2, unlike local-name() predicates which test every descendant.
+TRANSACTION_XPATHS = {
+    # No namespace (the usual case for Form 4 XML)
+    '': compile_transaction_xpaths(lambda tag: tag),
+    # Default EDGAR namespace
+    EDGAR_NAMESPACE: compile_transaction_xpaths(lambda tag: f"edgar:{tag}", {'edgar': EDGAR_NAMESPACE}),
+}
+# Any other namespace: fall back to namespace-agnostic local-name() matching
+LOCAL_NAME_TRANSACTION_XPATHS = compile_transaction_xpaths(lambda tag: f"*[local-name()='{tag}']")
+
+# --- Streaming Parse Targets ---
+# Issuer/filer fields and relationship flags captured as their end events stream
+# past (first value wins), so no further lookups over the tree are needed.
+METADATA_TAGS = {
+    'issuerName', 'issuerTradingSymbol', 'rptOwnerName', 'rptOwnerTitle',
+    'isDirector', 'isOfficer', 'isTenPercentOwner', 'isOther', 'otherText',
+}
+# Transaction elements are read and then freed as soon as they are complete.
+TRANSACTION_TAGS = {'nonDerivativeTransaction', 'derivativeTransaction'}
+
+
+# --- Trade Record ---
+
+@dataclass(slots=True)
+class Trade:
+    """A single filtered insider transaction; field names match the dashboard's upload schema."""
+    date: str
+    code: str
+    ticker: str
+    shares: float
+    price: float
+    value: float
+    company_name: str
+    filer: str
+    person_title: str
+    is_value_trade: bool
+
+
+class TradeTally:
+    """
+    Accumulates everything the run needs from the parsed trades in a single
+    streaming pass: the full list for upload, per-code counts, value totals,
+    mega-trade stats and a bounded min-heap of the top trades by value.
+    """
+
+    def __init__(self, top_n):
+        self.trades = []
+        self.code_counts = Counter()
+        self.total_value = 0.0
+        self.mega_trade_count = 0
+        self.mega_trade_total_value = 0.0
+        self._top_n = top_n
+        # (value, -sequence, trade): the sequence breaks value ties (earlier trade
+        # ranks higher) so Trade objects themselves are never compared.
+        self._top_heap = []
+
+    def add(self, trades):
+        """Folds one filing's trades into the running totals."""
+        for trade in trades:
+            self.trades.append(trade)
+            self.code_counts[trade.code] += 1
+
+            # Only include P and S (Purchase/Sale) in the total dollar value calculation
+            if trade.is_value_trade:
+                self.total_value += trade.value
+
+                # Check for mega trade status
+                if trade.value >= MEGA_TRADE_THRESHOLD:
+                    self.mega_trade_count += 1
+                    self.mega_trade_total_value += trade.value
+
+            entry = (trade.value, -len(self.trades), trade)
+            if len(self._top_heap) < self._top_n:
+                heapq.heappush(self._top_heap, entry)
+            elif entry > self._top_heap[0]:
+                heapq.heapreplace(self._top_heap, entry)
+
+    def top_trades(self):
+        """Returns the top trades by value, descending."""
+        return [trade for _, _, trade in sorted(self._top_heap, reverse=True)]
 
 
 # --- Utility Functions ---
@@ -60,7 +199,8 @@ def get_last_business_day():
 
 def get_form4_urls_from_index(date):
     """
-    Downloads the master.idx file and filters for ALL Form 4 filings for the given date.
+    Streams the master.idx file and filters for ALL Form 4 filings for the given date
+    as the lines arrive, so the full index is never buffered in memory.
     """
     index_url = get_edgar_archive_date_url(date)
     form4_urls = []
@@ -68,10 +208,22 @@ def get_form4_urls_from_index(date):
     print(f"  -> Downloading Index for {date.strftime('%Y-%m-%d')}...")
 
     try:
-        response = requests.get(index_url, headers=HEADERS, timeout=30)
-        response.raise_for_status()
+        with _SESSION.get(index_url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+
+            # Iterate through raw index lines; the cheap substring check skips the vast
+            # majority of non-Form 4 rows before any regex or decode work is done.
+            for line in response.iter_lines(chunk_size=INDEX_CHUNK_SIZE):
+                if b"|4|" not in line:
+                    continue
+
+                match = FORM4_INDEX_LINE.search(line)
+                if match:
+                    file_path = match.group(1).decode('latin-1')
+                    full_url = f"https://www.sec.gov/Archives/{file_path}"
+                    form4_urls.append(full_url)
     except requests.exceptions.HTTPError as e:
-        if response.status_code == 404:
+        if e.response is not None and e.response.status_code == 404:
             # This is common if the day's index is not yet published
             print(f"  [Warning] Index not found (404) for {date.strftime('%Y-%m-%d')}.", file=sys.stderr)
             return []
@@ -83,144 +235,313 @@ def get_form4_urls_from_index(date):
         else:
             print(f"  [Error] Network error downloading index {index_url}: {e}", file=sys.stderr)
         return []
-
-    # Iterate through index lines
-    for line in response.text.splitlines():
-        
-        parts = line.split('|')
-        if len(parts) >= 3 and parts[2] == '4':
-            if len(parts) == 5:
-                file_path = parts[4]
-                full_url = f"https://www.sec.gov/Archives/{file_path}"
-                form4_urls.append(full_url)
     
     print(f"  -> Found {len(form4_urls)} Form 4 filings for processing.")
     return form4_urls
 
-def extract_value_via_iteration(parent_element, target_tag_name):
+def extract_transaction_value(transaction, value_xpath):
     """
-    The most robust way to find a value: iterates over all descendants of the parent
-    and checks if the tag name ends with the target_tag_name (e.g., 'transactionShares' or 'value').
+    Finds the numeric <value> inside a transaction's container tag (e.g.
+    'transactionShares') with a single compiled XPath evaluated in libxml2.
+    Returns 0.0 if the container or its value is missing or unparsable.
     """
-    value = None
-    
-    # 1. First, find the container tag (e.g., transactionShares)
-    container_element = None
-    for element in parent_element.iter():
-        if element.tag.endswith(target_tag_name):
-            container_element = element
-            break
-        
-    if container_element is None:
-        return None
-
-    # 2. Once the container is found, look for the 'value' tag within its descendants.
-    for element in container_element.iter():
-        if element.tag.endswith('value') and element.text:
-            value = element.text.strip()
-            break
-    
-    if value: 
+    for value in value_xpath(transaction):
         try:
-            # Clean up the value (remove commas) and convert to float
-            return float(value.replace(',', '').strip())
+            # Fast path: float() parses in C and already tolerates surrounding whitespace
+            return float(value)
         except ValueError:
             pass
-        
+
+        if value.strip():
+            try:
+                # Slow path, only for values with thousands separators (e.g. "1,000")
+                return float(value.replace(',', ''))
+            except ValueError:
+                pass
+            break
+
     return 0.0
     
-def clean_and_extract_xml(xml_text):
+# Literal XML block boundaries inside the filing's TXT container
+XML_START_TAG = b"<ownershipDocument"
+XML_END_TAG = b"</ownershipDocument>"
+
+def clean_and_extract_xml(xml_bytes):
     """
-    Isolates the pure XML block from the surrounding TXT container and cleans it up.
+    Isolates the pure XML block from the surrounding TXT container.
+    Works on the raw response bytes with plain substring search, so no regex or
+    full decode is needed; lxml decodes the sliced document itself.
     """
-    START_TAG = "<ownershipDocument"
-    END_TAG = "</ownershipDocument>"
-    
     # Find the start and end of the XML block
-    start_match = re.search(START_TAG, xml_text, re.IGNORECASE)
-    end_match = re.search(END_TAG, xml_text, re.IGNORECASE | re.DOTALL)
+    xml_start_index = xml_bytes.find(XML_START_TAG)
 
-    if not start_match:
+    if xml_start_index == -1:
         raise ValueError("Could not find the starting tag: <ownershipDocument>")
 
-    xml_start_index = start_match.start()
+    xml_end_index = xml_bytes.rfind(XML_END_TAG)
 
-    if end_match:
-        xml_end_index = end_match.end()
-        cleaned_xml = xml_text[xml_start_index:xml_end_index]
-    else:
-        # Fallback if end tag is missing (though this shouldn't happen)
-        cleaned_xml = xml_text[xml_start_index:]
-            
-    # Remove XML declaration line (e.g., <?xml version="1.0" ... ?>)     
-    cleaned_xml = re.sub(r'<\?xml[^>]*\?>', '', cleaned_xml, flags=re.IGNORECASE)
-    
-    cleaned_xml = cleaned_xml.strip()
-        
-    return cleaned_xml
-        
-def parse_form4_url(xml_url):
+    if xml_end_index != -1:
+        return xml_bytes[xml_start_index:xml_end_index + len(XML_END_TAG)]
+
+    # Fallback if end tag is missing (though this shouldn't happen)
+    return xml_bytes[xml_start_index:]
+
+
+# --- Concurrent Download Pipeline ---
+
+class RateLimiter:
     """
-    Downloads, cleans, and parses a single Form 4 XML file, extracting trades
-    that match the TARGET_CODES filter.
+    Allows at most `rate` requests to start in any one-second window. Each
+    acquired slot is handed back one second later, so bursts go through
+    immediately and only the excess waits.
     """
-    trades = []
-                        
-    # Adhere to rate limit
-    time.sleep(REQUEST_DELAY)
-    
+
+    def __init__(self, rate):
+        self._slots = asyncio.Semaphore(rate)
+
+    async def wait(self):
+        await self._slots.acquire()
+        asyncio.get_running_loop().call_later(1.0, self._slots.release)
+
+
+def get_retry_delay(response, attempt):
+    """
+    Returns how many seconds to wait before retrying a throttled request: the
+    server's Retry-After header (delta-seconds or HTTP-date) when present,
+    otherwise exponential backoff.
+    """
+    retry_after = response.headers.get('Retry-After', '').strip()
+
+    if retry_after.isdigit():
+        return float(retry_after)
+
+    if retry_after:
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+
+    return RETRY_BACKOFF * 2 ** attempt
+
+
+def get_cache_path(xml_url):
+    """Returns the local cache file for a filing URL (SEC Archives URLs are immutable)."""
+    return Path(SEC_CACHE_DIR) / (hashlib.sha1(xml_url.encode()).hexdigest() + '.xml.gz')
+
+
+def read_cached_filing(xml_url):
+    """Returns the cached bytes of a previously downloaded filing, or None on a cache miss."""
+    cache_path = get_cache_path(xml_url)
     try:
-        response = requests.get(xml_url, headers=HEADERS, timeout=15)
-        response.raise_for_status()
-        xml_text = response.text
-    except requests.exceptions.RequestException:
+        cached = cache_path.read_bytes()
+        if cached:
+            return gzip.decompress(cached)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, zlib.error):
+        pass
+    # An empty, corrupt or truncated entry: drop it so it is rewritten after the download
+    try:
+        cache_path.unlink()
+    except OSError:
+        pass
+    return None
+
+
+def write_cached_filing(xml_url, xml_bytes):
+    """Stores a downloaded filing gzip-compressed, writing atomically via a temp file."""
+    cache_path = get_cache_path(xml_url)
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_bytes(gzip.compress(xml_bytes, compresslevel=1))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        # A failed cache write must never lose the filing itself
+        print(f"    [Warning] Could not cache {xml_url.split('/')[-1]}: {e}", file=sys.stderr)
+
+
+async def fetch_form4(session, xml_url, semaphore, limiter):
+    """
+    Returns a single Form 4 filing from the local cache, or downloads (and caches)
+    it. When the SEC answers with 429 (Too Many Requests) or 503, waits as long as
+    its Retry-After header asks (or backs off exponentially) and retries. Returns
+    (xml_url, xml_bytes), with xml_bytes set to None if the download ultimately failed.
+    """
+    xml_bytes = await asyncio.to_thread(read_cached_filing, xml_url)
+    if xml_bytes is not None:
+        return xml_url, xml_bytes
+
+    async with semaphore:
+        for attempt in range(MAX_RETRIES + 1):
+            await limiter.wait()
+            try:
+                async with session.get(xml_url, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                    if response.status in RETRYABLE_STATUSES and attempt < MAX_RETRIES:
+                        await asyncio.sleep(get_retry_delay(response, attempt))
+                        continue
+                    response.raise_for_status()
+                    xml_bytes = await response.read()
+                    break
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                break
+
+    if xml_bytes is None:
         print(f"    [Error] Failed to download {xml_url.split('/')[-1]}", file=sys.stderr)
-        return trades
-            
+        return xml_url, None
+
+    await asyncio.to_thread(write_cached_filing, xml_url, xml_bytes)
+    return xml_url, xml_bytes
+
+
+async def download_and_parse_form4(session, xml_url, semaphore, limiter, pool):
+    """
+    Downloads a single filing, then hands the bytes to the parse pool so CPU-bound
+    parsing overlaps with the remaining downloads. Returns (xml_url, trades).
+    """
+    xml_url, xml_bytes = await fetch_form4(session, xml_url, semaphore, limiter)
+
+    if xml_bytes is None:
+        return xml_url, []
+
+    loop = asyncio.get_running_loop()
+    trades = await loop.run_in_executor(pool, parse_form4_filing, xml_bytes, xml_url)
+    return xml_url, trades
+
+
+async def download_and_parse_filings(urls, handle_trades):
+    """
+    Downloads all Form 4 filings concurrently (capped by the SEC rate limit) and
+    parses each one on a worker process as soon as it arrives, passing each
+    filing's trades to handle_trades as it completes.
+    """
+    Path(SEC_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+
+    semaphore = asyncio.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+    limiter = RateLimiter(MAX_REQUESTS_PER_SECOND)
+    connector = aiohttp.TCPConnector(limit_per_host=MAX_CONCURRENT_REQUESTS)
+
+    # The streaming parse loop runs Python code per element and holds the GIL, so
+    # processes (not threads) are what actually spread parsing across cores.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        async with aiohttp.ClientSession(headers=HEADERS, connector=connector) as session:
+            tasks = [download_and_parse_form4(session, url, semaphore, limiter, pool) for url in urls]
+
+            for i, task in enumerate(asyncio.as_completed(tasks)):
+                xml_url, trades = await task
+                print(f"    Parsed filing {i+1}/{len(urls)}: {xml_url.split('/')[-1]}", end='\r')
+                handle_trades(trades)
+
+
+def first_text(xpath, node):
+    """Returns the first non-empty, stripped text result of a compiled XPath, or None."""
+    for text in xpath(node):
+        text = text.strip()
+        if text:
+            return text
+    return None
+
+
+def extract_transaction(transaction, xpaths):
+    """
+    Reads (date, code, shares, price) from a single transaction element using the
+    document's specialized xpaths, or returns None if the transaction is filtered
+    out by TARGET_CODES or has no shares.
+    """
+    transaction_code = (first_text(xpaths['transactionCode'], transaction) or 'N/A').upper()
+
+    # 1. Transaction Code (MANDATORY FILTER)
+    if transaction_code not in TARGET_CODES:
+        return None
+
+    # Transaction date relies on the internal <value> tag.
+    transaction_date = first_text(xpaths['transactionDate'], transaction) or 'N/A'
+
+    # 2. Shares/Amount
+    shares = extract_transaction_value(transaction, xpaths['transactionShares'])
+
+    # Skip if no shares or amount
+    if shares == 0.0:
+        return None
+
+    # 3. Price per share
+    price = extract_transaction_value(transaction, xpaths['transactionPricePerShare'])
+
+    return transaction_date, transaction_code, shares, price
+
+
+def parse_form4_filing(xml_bytes, xml_url):
+    """
+    Cleans and stream-parses a single downloaded Form 4 XML file in one pass,
+    extracting trades that match the TARGET_CODES filter.
+    """
+    trades = []
+
     try:
-        cleaned_xml_text = clean_and_extract_xml(xml_text)
-        root = ET.fromstring(cleaned_xml_text)
-    
-        # --- 1. EXTRACT FILER AND ISSUER METADATA ---
-        issuer_name = 'UNKNOWN'
-        issuer_ticker = 'N/A'
-        filer_name = 'UNKNOWN'
-        filer_relationship = 'N/A'
-        
-        # Iterate to find primary identifiers
-        for element in root.iter():
-            if element.tag.endswith('issuerName') and element.text:
-                issuer_name = element.text.strip()
-            elif element.tag.endswith('issuerTradingSymbol') and element.text:
-                issuer_ticker = element.text.strip().upper()
-            elif element.tag.endswith('rptOwnerName') and element.text:
-                filer_name = element.text.strip()
-            # Try to get explicit title first (this is the most useful field)
-            elif element.tag.endswith('rptOwnerTitle') and element.text:
-                filer_relationship = element.text.strip()
+        cleaned_xml = clean_and_extract_xml(xml_bytes)
+
+        metadata = {}
+        transactions = []
+
+        # --- 1. SINGLE STREAMING PASS OVER THE DOCUMENT ---
+        # Collect metadata as it streams past and read each transaction on its end
+        # event, then free it (and its already-processed siblings) to keep memory flat.
+        context = etree.iterparse(BytesIO(cleaned_xml), events=('end',), recover=True)
+
+        # Hoist everything touched on every end event into locals
+        transaction_tags = TRANSACTION_TAGS
+        metadata_tags = METADATA_TAGS
+        append_transaction = transactions.append
+        xpaths = None
+
+        for _, element in context:
+            # rpartition splits off any '{namespace}' prefix without building a QName object
+            namespace, _, tag = element.tag.rpartition('}')
+
+            if tag in transaction_tags:
+                if xpaths is None:
+                    # Specialize once per document on its namespace ('' if none)
+                    xpaths = TRANSACTION_XPATHS.get(namespace[1:], LOCAL_NAME_TRANSACTION_XPATHS)
+
+                transaction = extract_transaction(element, xpaths)
+                if transaction is not None:
+                    append_transaction(transaction)
+
+                element.clear()
+                parent = element.getparent()
+                while element.getprevious() is not None:
+                    del parent[0]
+            elif tag in metadata_tags and tag not in metadata:
+                text = element.text
+                if text:
+                    text = text.strip()
+                    if text:
+                        metadata[tag] = text
+
+        # --- 2. EXTRACT FILER AND ISSUER METADATA ---
+        issuer_name = metadata.get('issuerName', 'UNKNOWN')
+        issuer_ticker = metadata.get('issuerTradingSymbol', 'N/A').upper()
+        filer_name = metadata.get('rptOwnerName', 'UNKNOWN')
+        # Try to get explicit title first (this is the most useful field)
+        filer_relationship = metadata.get('rptOwnerTitle', 'N/A')
         
         # If explicit title is missing, infer relationship from boolean flags
-        if filer_relationship == 'N/A' or filer_relationship == '':
+        if filer_relationship == 'N/A':
             relationship_flags = []
     
             # Check for boolean flags (usually 1 for True, 0 for False)
-            if root.find('.//isDirector') is not None and root.find('.//isDirector').text.strip() == '1':
+            if metadata.get('isDirector') == '1':
                 relationship_flags.append('Director')
-            if root.find('.//isOfficer') is not None and root.find('.//isOfficer').text.strip() == '1':
+            if metadata.get('isOfficer') == '1':
                 relationship_flags.append('Officer')
-            if root.find('.//isTenPercentOwner') is not None and root.find('.//isTenPercentOwner').text.strip() == '1':
+            if metadata.get('isTenPercentOwner') == '1':
                 relationship_flags.append('10% Owner')
             
             # --- CHECK FOR ISOTHER AND OTHERTEXT ---
-            is_other_flag = root.find('.//isOther')
-            if is_other_flag is not None and is_other_flag.text.strip() == '1':
-                other_text_element = root.find('.//otherText')
-                if other_text_element is not None and other_text_element.text:
-                    # If otherText is provided, use it as the relationship
-                    relationship_flags.append(other_text_element.text.strip())
-                else:
-                    # If isOther is checked but no text is given
-                    relationship_flags.append('Other (Filer Specified)')
+            if metadata.get('isOther') == '1':
+                # If otherText is provided, use it as the relationship; if isOther
+                # is checked but no text is given, fall back to a generic label.
+                relationship_flags.append(metadata.get('otherText', 'Other (Filer Specified)'))
             
             if relationship_flags:
                 # Set relationship to the combined list (e.g., "Director, 10% Owner")
@@ -230,41 +551,8 @@ def parse_form4_url(xml_url):
                 filer_relationship = 'Other'
         
         
-        # --- 2. EXTRACT TRANSACTIONS ---
-                        
-        # Find all transaction elements (trying with and without namespace)
-        non_derivative_transactions = root.findall(f'.//{NAMESPACE}nonDerivativeTransaction') or root.findall('.//nonDerivativeTransaction')
-        derivative_transactions = root.findall(f'.//{NAMESPACE}derivativeTransaction') or root.findall('.//derivativeTransaction')
-                        
-        # Process transactions
-        for transaction in non_derivative_transactions + derivative_transactions:
-            
-            transaction_code = 'N/A'
-            transaction_date = 'N/A'
-        
-            # Extract Code and Date using iteration
-            for element in transaction.iter():
-                if element.tag.endswith('transactionCode') and element.text:
-                    transaction_code = element.text.strip().upper()
-                # Find transaction date. This relies on the internal <value> tag.
-                elif element.tag.endswith('transactionDate'):
-                    date_value_element = element.find('.//value')
-                    if date_value_element is not None and date_value_element.text:
-                        transaction_date = date_value_element.text.strip()
-            
-            # 1. Transaction Code (MANDATORY FILTER)
-            if transaction_code not in TARGET_CODES:
-                continue
-        
-            # 2. Shares/Amount (using hyper-robust function)
-            shares = extract_value_via_iteration(transaction, 'transactionShares')
-    
-            # Skip if no shares or amount
-            if shares == 0.0:
-                continue
-        
-            # 3. Price per share (using hyper-robust function)
-            price = extract_value_via_iteration(transaction, 'transactionPricePerShare')
+        # --- 3. BUILD TRADES ---
+        for transaction_date, transaction_code, shares, price in transactions:
     
             # Calculate Value (Shares * Price)
             value = shares * price
@@ -272,23 +560,23 @@ def parse_form4_url(xml_url):
             # Flag if this transaction code should be used for the value summary (still only P and S)
             is_value_trade = transaction_code in VALUE_CODES
         
-            trade = {
-                'date': transaction_date,
-                'code': transaction_code,
-                'ticker': issuer_ticker,
-                'shares': shares,
-                'price': price,
-                'value': value,
-                'company_name': issuer_name,
-                'filer': filer_name,
-                'person_title': filer_relationship,
-                'is_value_trade': is_value_trade
-            }
+            trade = Trade(
+                date=transaction_date,
+                code=transaction_code,
+                ticker=issuer_ticker,
+                shares=shares,
+                price=price,
+                value=value,
+                company_name=issuer_name,
+                filer=filer_name,
+                person_title=filer_relationship,
+                is_value_trade=is_value_trade
+            )
             # --- APPLY MINIMUM VALUE FILTER ---
             # We only upload trades that are over the $1M threshold
-            if trade['is_value_trade'] and trade['value'] >= MIN_TRADE_VALUE:
+            if trade.is_value_trade and trade.value >= MIN_TRADE_VALUE:
                 trades.append(trade)
-            elif not trade['is_value_trade']:
+            elif not trade.is_value_trade:
                 # Always include non-value trades (M, X, V) for completeness, as their value is often $0
                 trades.append(trade)
 
@@ -296,8 +584,8 @@ def parse_form4_url(xml_url):
         # Catch errors from clean_and_extract_xml
         print(f"    [Error] XML Cleanup failed for {xml_url.split('/')[-1]}: {ve}", file=sys.stderr)
         pass
-    except ET.ParseError as pe:
-        # Catch errors from ET.fromstring
+    except etree.XMLSyntaxError as pe:
+        # Catch errors from etree.iterparse
         print(f"    [Error] XML Parse failed for {xml_url.split('/')[-1]}: {pe}", file=sys.stderr)
         pass
     except Exception as e:
@@ -311,24 +599,29 @@ def parse_form4_url(xml_url):
     
 def upload_trades_to_dashboard(trades, api_key, run_time, summary_data):
     """    
-    Sends a list of trade dictionaries, run time, and summary data to the API endpoint.
+    Sends a list of Trade records, run time, and summary data to the API endpoint.
+    The payload is serialized with orjson and gzip-compressed before sending.
     """
     headers = {
         'X-API-KEY': api_key,
-        'Content-Type': 'application/json'
+        'Content-Type': 'application/json',
+        'Content-Encoding': 'gzip'
     }        
     
     # CRITICAL: Include the run_time tag and summary data in the payload
     payload = {
         'run_time': run_time,
-        'trades': trades,
+        'trades': trades, # orjson serializes the Trade dataclasses natively
         'summary': summary_data
     }
+
+    # Trade records are highly repetitive, so even the fastest gzip level shrinks them a lot
+    body = gzip.compress(orjson.dumps(payload), compresslevel=1)
     
     print(f"\n--- Attempting to upload {len(trades)} trade(s) to dashboard at {API_ENDPOINT} ---")
 
     try:
-        response = requests.post(API_ENDPOINT, headers=headers, json=payload, timeout=10)
+        response = _SESSION.post(API_ENDPOINT, headers=headers, data=body, timeout=10)
     
         if response.status_code == 200:
             print(f"✅ DASHBOARD UPLOAD SUCCESSFUL. Trades uploaded: {len(trades)}")
@@ -336,7 +629,12 @@ def upload_trades_to_dashboard(trades, api_key, run_time, summary_data):
             print(f"❌ UPLOAD FAILED (403 Forbidden): Check DASHBOARD_API_KEY and server configuration.")
         elif response.status_code == 400:
             print(f"❌ UPLOAD FAILED (400 Bad Request): Server rejected data format.")
-            print(f"Server Message: {response.json().get('message', 'No JSON message.')}")
+            # Decode the raw body directly; a non-JSON error page must not crash the report
+            try:
+                server_message = orjson.loads(response.content).get('message', 'No JSON message.')
+            except (orjson.JSONDecodeError, AttributeError):
+                server_message = 'No JSON message.'
+            print(f"Server Message: {server_message}")
         else:
             print(f"❌ UPLOAD FAILED (Status Code: {response.status_code})")
     
@@ -346,31 +644,27 @@ def upload_trades_to_dashboard(trades, api_key, run_time, summary_data):
         
 # --- Reporting and Main Execution ---
             
+# One format spec for the whole row: widths and truncation (".25") are applied by
+# the format mini-language in C instead of per-field ljust/rjust/slicing.
+_ROW_FMT = (
+    "{date:<10} {code:<4} {ticker:<8} {shares:>12,.0f} {price:>14} {value:>20} "
+    "{company_name:<25.25} {filer:<25.25} {person_title:<20.20}"
+)
+
 def format_report_row(trade):
     """Formats a single trade entry for the final report."""
-    date = trade['date'].ljust(10)
-    code = trade['code'].ljust(4)
-    ticker = trade['ticker'].ljust(8)
-    shares = f"{trade['shares']:,.0f}".rjust(12)
-                        
-    # Format Price: Use currency format, or N/A if 0.0
-    price_str = f"${trade['price']:,.2f}" if trade['price'] > 0 else "N/A"
-    price_formatted = price_str.rjust(14)
-                        
-    # Format Value
-    value_formatted = f"${trade['value']:,.2f}".rjust(20)
-        
-    # Format Company Name (truncate to 25 chars)
-    company_name_truncated = trade['company_name'][:25].ljust(25) 
-            
-    # Format Filer Name (truncate to 25 chars)
-    filer_name_truncated = trade['filer'][:25].ljust(25)
-    
-    # Format Title (truncate to 20 chars)
-    person_title_truncated = trade['person_title'][:20].ljust(20)
-
-    # Updated return string to use new formatted variables
-    return f"{date} {code} {ticker} {shares} {price_formatted} {value_formatted} {company_name_truncated} {filer_name_truncated} {person_title_truncated}"
+    return _ROW_FMT.format_map({
+        'date': trade.date,
+        'code': trade.code,
+        'ticker': trade.ticker,
+        'shares': trade.shares,
+        # Format Price: Use currency format, or N/A if 0.0
+        'price': f"${trade.price:,.2f}" if trade.price > 0 else "N/A",
+        'value': f"${trade.value:,.2f}",
+        'company_name': trade.company_name,
+        'filer': trade.filer,
+        'person_title': trade.person_title,
+    })
     
 def main():
     print("Initializing SEC Form 4 Insider Trading Monitor...")
@@ -379,15 +673,6 @@ def main():
     run_time = datetime.now().isoformat()
     print(f"Script run time (ISO 8601): {run_time}")
     
-    all_trades = []
-    transaction_code_counts = defaultdict(int)
-    total_value_all = 0.0
-    total_trades_count_all = 0 
-    
-    # New variables for mega trade tracking
-    mega_trade_total_value = 0.0
-    mega_trade_count = 0
-    
     # --- DYNAMIC LIMITS IMPLEMENTATION ---
     target_date = get_last_business_day()
     
@@ -402,25 +687,10 @@ def main():
     # NO MAX_FILING_COUNT PASSED HERE
     urls = get_form4_urls_from_index(date)
     
-    # Process each URL found
-    for i, url in enumerate(urls): 
-        print(f"    Parsing filing {i+1}/{len(urls)}: {url.split('/')[-1]}", end='\r')
-    
-        trades = parse_form4_url(url)
-
-        for trade in trades:
-            all_trades.append(trade)
-            transaction_code_counts[trade['code']] += 1
-            total_trades_count_all += 1
-        
-            # Only include P and S (Purchase/Sale) in the total dollar value calculation
-            if trade['is_value_trade']:
-                total_value_all += trade['value']
-                
-                # Check for mega trade status
-                if trade['value'] >= MEGA_TRADE_THRESHOLD:
-                    mega_trade_count += 1
-                    mega_trade_total_value += trade['value']
+    # Download and parse every URL found, tallying trades as each filing completes
+    tally = TradeTally(REPORT_TOP_N)
+    if urls:
+        asyncio.run(download_and_parse_filings(urls, tally.add))
     
     # Ensure we print a newline after the progress indicator
     print(" " * 80, end='\r') # Clear the line
@@ -428,19 +698,19 @@ def main():
     
     # --- Summary Data for Dashboard ---
     summary_data = {
-        'mega_trade_count': mega_trade_count,
-        'mega_trade_total_value': mega_trade_total_value,
+        'mega_trade_count': tally.mega_trade_count,
+        'mega_trade_total_value': tally.mega_trade_total_value,
         'min_trade_value': MIN_TRADE_VALUE
     }
     
     # --- Upload to Dashboard after data collection is complete ---
-    upload_trades_to_dashboard(all_trades, DASHBOARD_API_KEY, run_time, summary_data)
+    upload_trades_to_dashboard(tally.trades, DASHBOARD_API_KEY, run_time, summary_data)
 
     
     # --- Generate Console Report (Using the uploaded/filtered data) ---
 
-    # Sort trades by value descending
-    sorted_trades = sorted(all_trades, key=lambda x: x['value'], reverse=True)
+    # Top trades by value (descending), already kept by the tally's bounded heap
+    top_trades = tally.top_trades()
         
     print("\n" + "="*145)
     print(f"AGGREGATE INSIDER TRADING REPORT (Targeting: {target_date.strftime('%Y-%m-%d')})")
@@ -451,23 +721,23 @@ def main():
     print(f"*** CONSOLE REPORT is for trades over ${MIN_TRADE_VALUE:,.2f} USD and non-value trades. (ALL available filings processed) ***")
         
     print("\nSUMMARY OF TRANSACTIONS FOUND:")
-    for code, count in sorted(transaction_code_counts.items(), key=lambda item: item[1], reverse=True):
+    for code, count in tally.code_counts.most_common():
         print(f"  Code {code}: {count} transactions")
             
-    print(f"\nTotal Filtered Transactions Found: {total_trades_count_all}")
-    print(f"Total Estimated Dollar Value (P/S only, filtered): ${total_value_all:,.2f}")
-    print(f"*** MEGA TRADES (> ${MEGA_TRADE_THRESHOLD:,.2f}) Found: {mega_trade_count} valued at ${mega_trade_total_value:,.2f} ***\n")
+    print(f"\nTotal Filtered Transactions Found: {len(tally.trades)}")
+    print(f"Total Estimated Dollar Value (P/S only, filtered): ${tally.total_value:,.2f}")
+    print(f"*** MEGA TRADES (> ${MEGA_TRADE_THRESHOLD:,.2f}) Found: {tally.mega_trade_count} valued at ${tally.mega_trade_total_value:,.2f} ***\n")
         
     # Updated console header to reflect the changes
     print("Date              Code Ticker        Shares             Price                  Value (USD)             Company (25 chars)          Filer (25 chars)          Title (20 chars)")
     print("----------------------------------------------------------------------------------------------------------------------------------------------------")
 
-    # Display top 20 trades
-    for trade in sorted_trades[:20]:
+    # Display top trades
+    for trade in top_trades:
         print(format_report_row(trade))
     
     print("\n----------------------------------------------------------------------------------------------------------------------------------------------------")
-    print(f"NOTE: Displaying top {min(20, total_trades_count_all)} trades by value. Filtering on codes: {', '.join(TARGET_CODES)}. Dollar value based only on P and S codes.")
+    print(f"NOTE: Displaying top {len(top_trades)} trades by value. Filtering on codes: {', '.join(TARGET_CODES)}. Dollar value based only on P and S codes.")
     
 if __name__ == '__main__':
     main()
\ No newline at end of file
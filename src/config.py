@@ -40,4 +40,9 @@ API_ENDPOINT = f"{DASHBOARD_HOST}:{DASHBOARD_PORT}/api/upload_trades"
 # This is the path where the Flask dashboard will store the trade data locally.
 DATA_FILE = os.environ.get('DATA_FILE') or "data/insider_trades.csv"
 
+# 5. SEC Download Cache
+# Downloaded Form 4 filings are cached here (gzip-compressed, keyed by URL) so reruns
+# for the same day only re-parse instead of re-downloading from the SEC.
+SEC_CACHE_DIR = os.environ.get('SEC_CACHE_DIR') or ".cache/sec"
+
 print("DIAGNOSTIC: Config loading successfully completed.")
\ No newline at end of file
@@ -1,7 +1,20 @@
-import json
+import argparse
+import gzip
+import hmac
+import math
 import os
+import pickle
+import shutil
 import sys
-from flask import Flask, request, jsonify, render_template_string
+import tempfile
+import threading
+import weakref
+import zlib
+from collections import deque
+from urllib.parse import urlencode
+import orjson
+from flask import Flask, request, render_template
+from flask_caching import Cache
 
 # --- FILTER CONSTANTS ---
 # Only display trades with a reported value greater than or equal to this amount.
@@ -23,8 +36,20 @@ except RuntimeError as e:
 
 # --- Flask Setup ---
 app = Flask(__name__)
+# templates/dashboard.html is compiled once and reused; don't re-check it on every
+# render (app.run(debug=True) would otherwise switch auto-reload on)
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+
+# Rendered dashboard pages, keyed by query string. Uploads/cleanups clear it; the
+# timeout bounds how long a write made by another process can go unseen.
+DASHBOARD_CACHE_TIMEOUT = 60
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': DASHBOARD_CACHE_TIMEOUT})
 # from flask_cors import CORS; CORS(app)
 
+# Helper function to build JSON responses with orjson instead of Flask's stdlib-json jsonify
+def ojsonify(obj, status=200):
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
 # Helper function to ensure the directory for DATA_FILE exists
 def ensure_data_directory_exists():
     """Checks for and creates the directory path for DATA_FILE."""
@@ -34,30 +59,389 @@ def ensure_data_directory_exists():
         os.makedirs(data_dir, exist_ok=True)
 
 
-def load_data():
-    """Loads trade data from the JSON file."""
-    # Ensure directory exists before checking for file existence
+# --- In-Memory Trade Store ---
+# DATA_FILE holds newline-delimited JSON (one trade per line) and is only appended to
+# on upload. These mirror its contents, so an upload costs O(new trades) for the
+# duplicate check and the write instead of O(all trades). The store is re-read only
+# when DATA_FILE's mtime differs from the one it was loaded at (e.g. another worker
+# wrote to it); the lock serializes reloads and read-check-append on uploads.
+#
+# "Seen before?" is answered by _SEEN_INDEX (a SeenTradeIndex) over get_dedup_key,
+# the same key clean_data deduplicates on, so both agree on what counts as a
+# duplicate. It keeps a Bloom filter and the most recent keys in memory and the
+# full key history in on-disk partitions, instead of an exact set of every key.
+_TRADES = []
+_SEEN_INDEX = None  # SeenTradeIndex, created by reset_store
+_STORE_MTIME_NS = None  # None until the store has been loaded
+_STORE_LOCK = threading.RLock()
+# Bumped whenever the store's contents change, to invalidate views derived from it
+_STORE_VERSION = 0
+# Most recent trade date in the store, maintained as trades are added ('' when empty)
+_LATEST_DATE = ''
+
+# Filing-level rows shown on the dashboard (grouped and value-filtered) plus an index
+# of them by uppercase ticker, rebuilt only when the store version changes rather
+# than on every page view
+_FILINGS_CACHE = {'version': None, 'filings': [], 'by_ticker': {}}
+
+# Buffer for every DATA_FILE read and write: one large buffer means one syscall per
+# MiB instead of one per line/record
+FILE_BUFFER_SIZE = 1 << 20
+
+# Above this DATA_FILE size (roughly a million trades), clean_data deduplicates through
+# on-disk hash partitions (DEDUP_PARTITIONS temp files) instead of one in-memory pass
+PARTITIONED_DEDUP_THRESHOLD_BYTES = 256 << 20
+DEDUP_PARTITIONS = 256
+
+# Sizing for the seen-trades Bloom filter; it is rebuilt at double capacity when outgrown
+# (about 2 bytes per key, with roughly a 0.5% false-positive rate at capacity)
+SEEN_FILTER_MIN_CAPACITY = 1_000_000
+SEEN_FILTER_BITS_PER_KEY = 16
+# One 6-bit in-word bit position per shift, from the hash bits above the word index
+SEEN_FILTER_MASK_SHIFTS = (22, 28, 34, 40, 46, 52, 58)
+# Number of most recently stored keys also kept exactly, so re-uploads of recent
+# filings (the common duplicate) are settled without touching the disk partitions
+RECENT_KEYS_LIMIT = 100_000
+# Stored keys are buffered in memory and written to their partitions in batches of this many
+SEEN_INDEX_FLUSH_KEYS = 65_536
+
+
+class SeenTradeIndex:
+    """
+    Answers "has this dedup key been stored?" without an exact in-memory set of
+    every key. A Bloom filter (a couple of bytes per key) settles most new keys,
+    and a bounded exact set the most recent ones. Any other filter hit is confirmed
+    against the full key history, which lives in DEDUP_PARTITIONS pickle files in a
+    private temp directory partitioned by hash(key), so a confirmation reads only
+    the partitions its keys hash to and a false positive never drops a new trade.
+    Keys are compared by equality throughout, exactly like clean_data's set.
+    """
+
+    def __init__(self):
+        self._dir = tempfile.mkdtemp(prefix='insider-trade-keys-')
+        # Removed along with the index (e.g. when reset_store replaces it)
+        weakref.finalize(self, shutil.rmtree, self._dir, ignore_errors=True)
+        self._pending = {}
+        self._pending_count = 0
+        self.key_count = 0
+        self.recent_keys = set()
+        self._recent_order = deque()
+        self._reset_filter(SEEN_FILTER_MIN_CAPACITY)
+
+    def _reset_filter(self, capacity):
+        # Blocked Bloom filter: each key sets one bit per SEEN_FILTER_MASK_SHIFTS within a
+        # single 64-bit word, so a lookup is one word read rather than several scattered ones
+        self.capacity = capacity
+        self._word_count = max(1, capacity * SEEN_FILTER_BITS_PER_KEY // 64)
+        self._words = memoryview(bytearray(8 * self._word_count)).cast('Q')
+
+    def _locate(self, key):
+        # Word index and in-word bit mask, both taken from the key's own 64-bit hash
+        key_hash = hash(key) & 0xFFFFFFFFFFFFFFFF
+        mask = 0
+        for shift in SEEN_FILTER_MASK_SHIFTS:
+            mask |= 1 << ((key_hash >> shift) & 63)
+        return key_hash % self._word_count, mask
+
+    def _set_bits(self, key):
+        """Sets key's filter bits; returns True if any was unset, i.e. key is definitely new."""
+        index, mask = self._locate(key)
+        words = self._words
+        word = words[index]
+        if word & mask == mask:
+            return False
+        words[index] = word | mask
+        return True
+
+    def _partition_path(self, partition_index):
+        return os.path.join(self._dir, f"{partition_index:02x}")
+
+    def _read_partition(self, partition_index):
+        # Each flush appends one pickled list of keys to the partition
+        try:
+            f = open(self._partition_path(partition_index), 'rb', buffering=FILE_BUFFER_SIZE)
+        except FileNotFoundError:
+            return
+        with f:
+            while True:
+                try:
+                    yield from pickle.load(f)
+                except EOFError:
+                    return
+
+    def add_if_new(self, key):
+        """
+        Adds key and returns True if the filter proves it was never added before.
+        Returns False, adding nothing, if it probably was: confirm with find_stored
+        and then add it with add.
+        """
+        if not self._set_bits(key):
+            return False
+        self._remember(key)
+        return True
+
+    def add(self, key):
+        """Adds a key confirmed (by find_stored) not to have been added before."""
+        self._set_bits(key)
+        self._remember(key)
+
+    def _remember(self, key):
+        if len(self._recent_order) >= RECENT_KEYS_LIMIT:
+            self.recent_keys.discard(self._recent_order.popleft())
+        self._recent_order.append(key)
+        self.recent_keys.add(key)
+        self._pending.setdefault(hash(key) % DEDUP_PARTITIONS, []).append(key)
+        self._pending_count += 1
+        self.key_count += 1
+        if self._pending_count >= SEEN_INDEX_FLUSH_KEYS:
+            self.flush()
+        if self.key_count > self.capacity:
+            self._grow_filter()
+
+    def flush(self):
+        """Writes buffered keys to their partitions."""
+        for partition_index, keys in self._pending.items():
+            with open(self._partition_path(partition_index), 'ab', buffering=FILE_BUFFER_SIZE) as f:
+                pickle.dump(keys, f, pickle.HIGHEST_PROTOCOL)
+        self._pending = {}
+        self._pending_count = 0
+
+    def _grow_filter(self):
+        # Re-created from the partitions, not from the stored trades
+        self.flush()
+        self._reset_filter(2 * self.capacity)
+        for partition_index in range(DEDUP_PARTITIONS):
+            for key in self._read_partition(partition_index):
+                self._set_bits(key)
+
+    def find_stored(self, keys):
+        """Returns the subset of keys that have been added, reading only their partitions."""
+        by_partition = {}
+        for key in keys:
+            by_partition.setdefault(hash(key) % DEDUP_PARTITIONS, set()).add(key)
+
+        stored = set()
+        for partition_index, wanted in by_partition.items():
+            stored.update(wanted.intersection(self._pending.get(partition_index, ())))
+            for key in self._read_partition(partition_index):
+                if key in wanted:
+                    stored.add(key)
+        return stored
+
+
+def is_legacy_json_array_file():
+    """Returns True if DATA_FILE still uses the old single-JSON-array format."""
+    with open(DATA_FILE, 'rb') as f:
+        for line in f:
+            stripped = line.lstrip()
+            if stripped:
+                return stripped.startswith(b'[')
+    return False
+
+
+def migrate_legacy_data_file():
+    """Converts a legacy JSON-array DATA_FILE to newline-delimited JSON, once."""
+    with open(DATA_FILE, 'rb', buffering=FILE_BUFFER_SIZE) as f:
+        try:
+            trades = orjson.loads(f.read())
+        except orjson.JSONDecodeError:
+            print(f"Error decoding JSON from {DATA_FILE}. Leaving the file unchanged.")
+            return
+
+    print(f"DIAGNOSTIC: Migrating {DATA_FILE} from a JSON array to JSON lines ({len(trades)} records).")
+    save_data(trades)
+
+
+def prepare_data_file():
+    """
+    Migrates a legacy JSON-array DATA_FILE to JSON lines if needed. Returns False
+    if DATA_FILE does not exist. Callers that stream iter_data_file into save_data
+    must call this first, so the migration's own save_data does not run while the
+    outer one is still writing.
+    """
     ensure_data_directory_exists()
 
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r') as f:
+    if not os.path.exists(DATA_FILE):
+        return False
+
+    if is_legacy_json_array_file():
+        migrate_legacy_data_file()
+    return True
+
+
+def iter_data_file():
+    """Streams trades from DATA_FILE one line at a time, skipping unreadable lines."""
+    if not prepare_data_file():
+        return
+
+    with open(DATA_FILE, 'rb', buffering=FILE_BUFFER_SIZE) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
             try:
-                # Load the JSON array of trades.
-                return json.load(f)
-            except json.JSONDecodeError:
-                print(f"Error decoding JSON from {DATA_FILE}. Returning empty list.")
-                return []
-    return []
+                yield orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # e.g. a line cut short by a crash mid-append
+                print(f"Error decoding JSON on line {line_number} of {DATA_FILE}. Skipping record.")
+
+
+def get_data_file_mtime_ns():
+    """Returns DATA_FILE's modification time in nanoseconds, or 0 if it does not exist."""
+    try:
+        return os.stat(DATA_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def get_data_file_mode():
+    """Returns DATA_FILE's permission bits, or 0o644 if it does not exist."""
+    try:
+        return os.stat(DATA_FILE).st_mode & 0o777
+    except FileNotFoundError:
+        return 0o644
+
+
+def get_data_file_size():
+    """Returns DATA_FILE's size in bytes, or 0 if it does not exist."""
+    try:
+        return os.stat(DATA_FILE).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def reset_store(trades, mtime_ns):
+    """
+    Replaces the in-memory store with the given trades (de-duplicated), recording the
+    DATA_FILE mtime they correspond to. New containers are bound rather than cleared
+    so a request still iterating the old list is unaffected.
+    """
+    global _TRADES, _SEEN_INDEX, _STORE_MTIME_NS, _STORE_VERSION, _LATEST_DATE
+
+    _TRADES = []
+    _SEEN_INDEX = SeenTradeIndex()
+    _LATEST_DATE = ''
+    add_unique_trades(trades)
+    _STORE_MTIME_NS = mtime_ns
+    _STORE_VERSION += 1
+
+
+def load_data():
+    """
+    Returns the de-duplicated list of all stored trades, (re)reading DATA_FILE into
+    the in-memory store on first use or when the file has changed since.
+    """
+    with _STORE_LOCK:
+        # Read the mtime before the contents so a write racing the read triggers
+        # another reload next time instead of being missed
+        mtime_ns = get_data_file_mtime_ns()
+        if mtime_ns != _STORE_MTIME_NS:
+            reset_store(iter_data_file(), mtime_ns)
+
+        return _TRADES
+
+
+def add_unique_trades(trades):
+    """
+    Adds trades whose key has not been seen before to the in-memory store and
+    returns just those newly added trades.
+    """
+    global _STORE_VERSION, _LATEST_DATE
+
+    added = []
+    # (key, trade, True if definitely new / False if it still needs confirming)
+    candidates = []
+    maybe_seen_keys = set()
+    # Bind the hot-loop lookups to locals
+    seen_index = _SEEN_INDEX
+    recent_keys = seen_index.recent_keys
+    add_if_new = seen_index.add_if_new
+    get_key = get_dedup_key
+    add_candidate = candidates.append
+
+    for trade in trades:
+        key = get_key(trade)
+        if key in recent_keys:
+            continue
+        # A repeat of a key awaiting confirmation waits with it, even if the filter
+        # has since been rebuilt without that key's bits
+        if key not in maybe_seen_keys and add_if_new(key):
+            add_candidate((key, trade, True))
+        else:
+            # Stored before, or a filter false positive: confirmed below
+            maybe_seen_keys.add(key)
+            add_candidate((key, trade, False))
+
+    # One read of the relevant partitions settles every filter hit from this batch
+    stored_keys = seen_index.find_stored(maybe_seen_keys) if maybe_seen_keys else set()
+    store_trade = _TRADES.append
+    add_trade = added.append
+    for key, trade, is_new in candidates:
+        if not is_new:
+            if key in stored_keys:
+                continue
+            stored_keys.add(key)
+            seen_index.add(key)
+        store_trade(trade)
+        add_trade(trade)
+    seen_index.flush()
+
+    if added:
+        _STORE_VERSION += 1
+        # str() so a malformed non-string date cannot break the comparison
+        latest_date = max(str(trade.get('date') or '0000-00-00') for trade in added)
+        if latest_date > _LATEST_DATE:
+            _LATEST_DATE = latest_date
+
+    return added
+
+
+def flush_to_disk(f):
+    """Flushes a written file and syncs it to disk, once after all of its writes."""
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def append_data(trades):
+    """Appends trades to DATA_FILE as JSON lines."""
+    ensure_data_directory_exists()
+
+    with open(DATA_FILE, 'ab', buffering=FILE_BUFFER_SIZE) as f:
+        for trade in trades:
+            f.write(orjson.dumps(trade, option=orjson.OPT_APPEND_NEWLINE))
+        flush_to_disk(f)
+    print(f"DIAGNOSTIC: Appended {len(trades)} new records to {DATA_FILE}")
+
 
 def save_data(data):
     """
-    Saves trade data to the JSON file.
+    Rewrites DATA_FILE with exactly the given trades, as JSON lines. The trades are
+    written to a sibling temporary file that then atomically replaces DATA_FILE, so
+    a crash mid-write never leaves a truncated file and readers (including a
+    generator still streaming the old DATA_FILE into data) see the old or new file.
     """
     ensure_data_directory_exists()
     
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
-    print(f"DIAGNOSTIC: Data successfully saved to {DATA_FILE} (Total records: {len(data)})")
+    data_dir = os.path.dirname(DATA_FILE) or '.'
+    # A unique temp file per call, so concurrent or nested writers never share one
+    fd, temp_path = tempfile.mkstemp(dir=data_dir, prefix=f"{os.path.basename(DATA_FILE)}.", suffix='.tmp')
+    # Counted while writing so data may be any iterable, including a generator
+    record_count = 0
+    try:
+        with open(fd, 'wb', buffering=FILE_BUFFER_SIZE) as f:
+            # mkstemp creates the file owner-only; keep DATA_FILE's usual permissions
+            os.chmod(temp_path, get_data_file_mode())
+            for trade in data:
+                f.write(orjson.dumps(trade, option=orjson.OPT_APPEND_NEWLINE))
+                record_count += 1
+            flush_to_disk(f)
+        os.replace(temp_path, DATA_FILE)
+    except BaseException:
+        # Leave DATA_FILE untouched and do not leave a partial temp file behind
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    print(f"DIAGNOSTIC: Data successfully saved to {DATA_FILE} (Total records: {record_count})")
+    return record_count
 
 
 # Helper function to safely convert value strings to sortable floats
@@ -73,32 +457,93 @@ def clean_and_convert_value(value_str):
         return 0.0
 
 
+def get_trade_key(trade):
+    """
+    Returns the composite key that uniquely identifies a transaction:
+    (date, ticker, filer, code, shares, price).
+    """
+    # Numbers and None are hashable as-is; see get_hashable_trade_key for the rest
+    return (
+        trade.get('date'),
+        trade.get('ticker'),
+        trade.get('filer'),
+        trade.get('code'),
+        trade.get('shares', 0.0),
+        trade.get('price', 0.0)
+    )
+
+
+def get_hashable_trade_key(trade):
+    """
+    Fallback for get_trade_key when a field holds an unhashable value (e.g. a list
+    from a malformed upload): every field is converted to its string form.
+    """
+    return tuple(str(field) for field in get_trade_key(trade))
+
+
+def get_dedup_key(trade):
+    """
+    Returns the hashable key every dedup path (uploads and clean_data) compares:
+    get_trade_key, or get_hashable_trade_key if that holds an unhashable value.
+    """
+    key = get_trade_key(trade)
+    try:
+        hash(key)
+    except TypeError:
+        return get_hashable_trade_key(trade)
+    return key
+
+
 def deduplicate_trades(trades):
     """
     Removes duplicate trades based on a composite key:
     (date, ticker, filer, code, shares, price).
     """
-    unique_trades = {}
+    seen_keys = set()
+    unique_trades = []
+    # Bind the hot-loop lookups to locals
+    get_key = get_dedup_key
+    add_key = seen_keys.add
+    keep_trade = unique_trades.append
     
     for trade in trades:
-        # Create a tuple key that uniquely identifies the transaction
-        # Uses date, issuer, filer, transaction type, quantity, and price.
-        unique_key = (
-            trade.get('date'),
-            trade.get('ticker'),
-            trade.get('filer'),
-            trade.get('code'),
-            # Convert shares and price to strings to make them hashable
-            str(trade.get('shares', 0.0)),
-            str(trade.get('price', 0.0))
-        )
+        unique_key = get_key(trade)
         
-        # Use the dictionary to enforce uniqueness. If the key is already in 
-        # the dict, we skip the trade, ensuring the first instance is kept.
-        if unique_key not in unique_trades:
-            unique_trades[unique_key] = trade
+        # Skip keys already seen, ensuring the first instance is kept
+        if unique_key not in seen_keys:
+            add_key(unique_key)
+            keep_trade(trade)
             
-    return list(unique_trades.values())
+    return unique_trades
+
+def deduplicate_trades_partitioned(trades):
+    """
+    Yields the same unique trades as deduplicate_trades while holding only one
+    partition's keys in memory at a time. Trades are spread over DEDUP_PARTITIONS
+    temporary files by key hash, then each file is deduplicated on its own; the
+    output is grouped by partition, keeping the first instance within each.
+    """
+    partitions = [tempfile.TemporaryFile() for _ in range(DEDUP_PARTITIONS)]
+    try:
+        for trade in trades:
+            key = get_dedup_key(trade)
+            pickle.dump((key, trade), partitions[hash(key) % DEDUP_PARTITIONS], pickle.HIGHEST_PROTOCOL)
+
+        for partition in partitions:
+            partition.seek(0)
+            seen_keys = set()
+            while True:
+                try:
+                    key, trade = pickle.load(partition)
+                except EOFError:
+                    break
+                if key not in seen_keys:
+                    seen_keys.add(key)
+                    yield trade
+    finally:
+        for partition in partitions:
+            partition.close()
+
 
 def group_trades_by_filing(trades):
     """
@@ -119,7 +564,10 @@ def group_trades_by_filing(trades):
         # The key combines the insider, ticker, and date to represent a single filing block
         group_key = (ticker, filer, date)
         
-        trade_value = clean_and_convert_value(trade.get('value'))
+        # 'value_f' is the numeric value precomputed at ingest; older records may lack it
+        trade_value = trade.get('value_f')
+        if trade_value is None:
+            trade_value = clean_and_convert_value(trade.get('value'))
         trade_code = trade.get('code')
 
         if group_key not in grouped_trades:
@@ -156,48 +604,176 @@ def group_trades_by_filing(trades):
     return final_list
 
 
+def get_display_filings(ticker=''):
+    """
+    Returns the grouped filings whose total value meets MIN_TRADE_VALUE, only those
+    for the given (uppercase) ticker if one is passed. The lists are cached until the
+    trade store changes; callers must not modify them in place.
+    """
+    with _STORE_LOCK:
+        all_trades = load_data()
+        if _FILINGS_CACHE['version'] != _STORE_VERSION:
+            # 'total_value' is already a float from group_trades_by_filing
+            filings = [
+                filing for filing in group_trades_by_filing(all_trades)
+                if filing['total_value'] >= MIN_TRADE_VALUE
+            ]
+            by_ticker = {}
+            for filing in filings:
+                by_ticker.setdefault(filing['ticker'].upper(), []).append(filing)
+
+            _FILINGS_CACHE['filings'] = filings
+            _FILINGS_CACHE['by_ticker'] = by_ticker
+            _FILINGS_CACHE['version'] = _STORE_VERSION
+
+        if ticker:
+            return _FILINGS_CACHE['by_ticker'].get(ticker, [])
+        return _FILINGS_CACHE['filings']
+
+
+# The configured API key, encoded once for the constant-time comparison below
+_API_KEY_BYTES = DASHBOARD_API_KEY.encode('utf-8') if DASHBOARD_API_KEY else b''
+
+
+def is_authorized_request():
+    """
+    Returns True if the request's X-API-KEY header matches DASHBOARD_API_KEY,
+    compared in constant time. Never True when no key is configured.
+    """
+    received_key = request.headers.get('X-API-KEY', '').encode('utf-8', 'ignore')
+    return bool(_API_KEY_BYTES) and hmac.compare_digest(received_key, _API_KEY_BYTES)
+
+
+def read_json_payload():
+    """
+    Parses the request body as JSON, transparently inflating uploads sent with
+    Content-Encoding: gzip (as the scraper does). Returns None if the body is invalid.
+    """
+    body = request.get_data(cache=False)
+    try:
+        if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+            body = gzip.decompress(body)
+        return orjson.loads(body)
+    except (OSError, EOFError, zlib.error, ValueError):
+        # gzip.BadGzipFile is an OSError, a corrupt deflate stream is a zlib.error,
+        # and orjson.JSONDecodeError is a ValueError
+        return None
+
+
 # --- API Endpoint 1: Permanent Data Ingestion with Deduplication ---
 @app.route('/api/upload_trades', methods=['POST'])
 def upload_trades():
     """
-    Receives new trade data, merges it with existing data, and deduplicates the
-    ENTIRE set before saving. This is the permanent fix for duplicates.
+    Receives new trade data and appends only the trades not already stored. The
+    in-memory key index is the permanent fix for duplicates.
     """
+    global _STORE_MTIME_NS
+
+    # 1. AUTHENTICATION: Validate the incoming API key from the HTTP Header (X-API-KEY)
+    # before touching the body, so unauthorized callers cannot force a large parse
+    if not is_authorized_request():
+        print(f"Upload attempt failed. Invalid key received: {request.headers.get('X-API-KEY')}")
+        return ojsonify({"message": "Unauthorized: Invalid API Key"}, 403)
 
     if not request.is_json:
-        return jsonify({"message": "Missing JSON in request"}), 400
+        return ojsonify({"message": "Missing JSON in request"}, 400)
 
-    payload = request.get_json()
-    
-    # 1. AUTHENTICATION: Validate the incoming API key from the HTTP Header (X-API-KEY)
-    received_key = request.headers.get('X-API-KEY')
+    payload = read_json_payload()
 
-    if received_key != DASHBOARD_API_KEY:
-        print(f"Upload attempt failed. Invalid key received: {received_key}")
-        return jsonify({"message": "Unauthorized: Invalid API Key"}), 403
+    if not isinstance(payload, dict):
+        return ojsonify({"message": "Invalid JSON in request body"}, 400)
 
     new_trades = payload.get('trades', [])
 
     if not isinstance(new_trades, list):
-        return jsonify({"message": "Invalid data format: 'trades' must be a list"}), 400
+        return ojsonify({"message": "Invalid data format: 'trades' must be a list"}, 400)
 
-    # Load existing data
-    existing_trades = load_data()
-    
-    # Merge existing trades and new trades
-    combined_trades = existing_trades + new_trades
-    
-    # Deduplicate the entire combined set
-    initial_count = len(combined_trades)
-    final_trades = deduplicate_trades(combined_trades)
-    
-    # Save the cleaned, final data, overwriting the old file
-    save_data(final_trades)
+    with _STORE_LOCK:
+        # Make sure the existing data (and its key index) is loaded and current
+        all_trades = load_data()
+        
+        # Keep only trades not seen before (including repeats within this upload)
+        added_trades = add_unique_trades(new_trades)
+        
+        # Precompute the numeric value once here so page views never re-parse it
+        for trade in added_trades:
+            trade['value_f'] = clean_and_convert_value(trade.get('value'))
+        
+        # Append just the new trades to the data file; the store already holds
+        # them, so record the new mtime instead of re-reading our own write
+        if added_trades:
+            try:
+                append_data(added_trades)
+            except OSError as e:
+                # The store already holds trades DATA_FILE may not (e.g. disk full);
+                # force the next load_data to re-read the file so a retry of this
+                # upload is not dropped as duplicates of trades that were never saved
+                _STORE_MTIME_NS = None
+                print(f"Error appending {len(added_trades)} trades to {DATA_FILE}: {e}")
+                cache.clear()
+                return ojsonify({"message": "Failed to save trades. Please retry the upload."}, 500)
+            _STORE_MTIME_NS = get_data_file_mtime_ns()
+            cache.clear()
 
-    deduped_count = len(final_trades)
-    duplicates_removed = initial_count - deduped_count
+        deduped_count = len(all_trades)
+    duplicates_removed = len(new_trades) - len(added_trades)
         
-    return jsonify({"message": f"Successfully processed. Total unique trades saved: {deduped_count}. Removed {duplicates_removed} duplicates during merge."}), 200
+    return ojsonify({"message": f"Successfully processed. Total unique trades saved: {deduped_count}. Removed {duplicates_removed} duplicates during merge."}, 200)
+
+
+def backfill_value_f(trade):
+    """Migrates a record stored before 'value_f' was precomputed at ingest."""
+    if 'value_f' not in trade:
+        trade['value_f'] = clean_and_convert_value(trade.get('value'))
+    return trade
+
+
+def clean_data_file_in_memory():
+    """
+    Deduplicates DATA_FILE in memory, rewrites it and rebuilds the store from the
+    result. Returns (records read, records kept).
+    """
+    # Read the file itself (not the in-memory store) so duplicates introduced
+    # outside this process are cleaned up too
+    existing_trades = list(iter_data_file())
+    if not existing_trades:
+        return 0, 0
+
+    cleaned_trades = [backfill_value_f(trade) for trade in deduplicate_trades(existing_trades)]
+
+    # Save the cleaned data and rebuild the in-memory store from it
+    save_data(cleaned_trades)
+    reset_store(cleaned_trades, get_data_file_mtime_ns())
+    return len(existing_trades), len(cleaned_trades)
+
+
+def clean_data_file_partitioned():
+    """
+    Same as clean_data_file_in_memory, but deduplicates through on-disk hash
+    partitions, so at most one partition's keys are in memory at a time. The
+    in-memory store is released first and left unloaded afterwards (the next
+    load_data re-reads the cleaned file), so neither the raw nor the cleaned
+    trades are held in full during the cleanup. save_data swaps the new file in
+    only once complete, so DATA_FILE can be streamed from while it is rewritten.
+    Must be called with _STORE_LOCK held.
+    """
+    # mtime None never matches the file, so the next load_data reloads the store
+    reset_store((), None)
+    _FILINGS_CACHE.update(version=None, filings=[], by_ticker={})
+
+    # Migrate a legacy file now, not lazily inside the generator while save_data writes
+    prepare_data_file()
+    initial_count = 0
+
+    def read_and_count():
+        nonlocal initial_count
+        for trade in iter_data_file():
+            initial_count += 1
+            yield trade
+
+    cleaned_trades = (backfill_value_f(trade) for trade in deduplicate_trades_partitioned(read_and_count()))
+    final_count = save_data(cleaned_trades)
+    return initial_count, final_count
 
 
 # --- API Endpoint 2: One-Time Cleanup Tool ---
@@ -208,25 +784,22 @@ def clean_data():
     Requires API key for execution.
     """
     # 1. AUTHENTICATION: Validate the incoming API key
-    received_key = request.headers.get('X-API-KEY')
-
-    if received_key != DASHBOARD_API_KEY:
-        return jsonify({"message": "Unauthorized: Invalid API Key"}), 403
+    if not is_authorized_request():
+        return ojsonify({"message": "Unauthorized: Invalid API Key"}, 403)
 
-    # Load existing data
-    existing_trades = load_data()
-    
-    if not existing_trades:
-        return jsonify({"message": "Data file is already empty or unreadable."}), 200
+    with _STORE_LOCK:
+        if get_data_file_size() > PARTITIONED_DEDUP_THRESHOLD_BYTES:
+            # Too large to deduplicate comfortably in memory: stream the file through
+            # on-disk hash partitions straight into the rewritten file
+            initial_count, final_count = clean_data_file_partitioned()
+        else:
+            initial_count, final_count = clean_data_file_in_memory()
 
-    # Deduplicate the existing set
-    initial_count = len(existing_trades)
-    cleaned_trades = deduplicate_trades(existing_trades)
-    final_count = len(cleaned_trades)
-    duplicates_removed = initial_count - final_count
+        if not initial_count:
+            return ojsonify({"message": "Data file is already empty or unreadable."}, 200)
 
-    # Save the cleaned data
-    save_data(cleaned_trades)
+        duplicates_removed = initial_count - final_count
+        cache.clear()
 
     if duplicates_removed > 0:
         message = f"Cleanup successful! Removed {duplicates_removed} duplicates. Total unique trades remaining: {final_count}."
@@ -234,47 +807,79 @@ def clean_data():
         message = "Cleanup successful! No duplicates found in the existing file."
 
     print(f"DIAGNOSTIC: {message}")
-    return jsonify({"message": message}), 200
+    return ojsonify({"message": message}, 200)
 
 # --- Dashboard Frontend with Sorting and Filtering ---
 
+# Columns with clickable sort headers on the dashboard
+SORTABLE_COLUMNS = ('ticker', 'company_name', 'date', 'value')
+
+# Filings per dashboard page (overridable per request with ?page_size=, up to the max)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+# Helper to read a positive integer query arg, falling back to the default if absent/invalid
+def get_positive_int_arg(name, default):
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+# Helper to generate the new URL query string for sorting links
+def get_sort_link(column_name, current_sort_by, current_order, preserved_params):
+    # preserved_params keeps the current filter/page size; the page itself resets
+    # to 1 since a new sort order starts from the top
+
+    # Logic to toggle the sort order if the current column is clicked
+    if column_name == current_sort_by:
+        # Toggle order: desc -> asc, asc -> desc
+        new_order = 'asc' if current_order == 'desc' else 'desc'
+    else:
+        # New column clicked, reset to default (descending)
+        new_order = 'desc'
+
+    return "/?" + urlencode({'sort_by': column_name, 'order': new_order, **preserved_params})
+
+
+# Helper to generate the link to another page of the current view
+def get_page_link(page):
+    return "/?" + urlencode({**request.args.to_dict(), 'page': page})
+
+
+# Helper to generate the sort indicator for the header
+def get_sort_indicator(column_name, current_sort_by, current_order):
+    if column_name == current_sort_by:
+        return '▲' if current_order == 'asc' else '▼'
+    return ''
+
+
+# Helper for the dashboard cache: ?nocache=1 renders fresh (e.g. while debugging)
+def is_cache_bypassed():
+    return request.args.get('nocache') == '1'
+
+
 @app.route('/')
+@cache.cached(query_string=True, unless=is_cache_bypassed)
 def dashboard():
     """Renders the main dashboard page, applying sorting and filtering."""
     
-    # 1. Load the raw data
-    all_trades = load_data()
-    
-    # 2. NEW STEP: Group the transaction-level data into filing-level data
-    aggregated_trades = group_trades_by_filing(all_trades)
-    
-    # --- 3. Get filter and sort parameters from the URL query string ---
+    # --- 1. Get filter and sort parameters from the URL query string ---
     # Default sort is by date descending
     sort_by = request.args.get('sort_by', 'date') 
     # NEW: Get sort order (default is 'desc')
     sort_order = request.args.get('order', 'desc')
     filter_ticker = request.args.get('filter_ticker', '').upper().strip()
     
-    # --- 4. Apply Filtering Logic ---
-    
-    # Start filtering on the aggregated list
-    trades_to_display = aggregated_trades
-    
-    # A. Filter by Minimum Value (Now checking 'total_value' on the aggregated list)
-    trades_to_display = [
-        trade for trade in trades_to_display
-        # 'total_value' is already a float from group_trades_by_filing
-        if trade.get('total_value', 0.0) >= MIN_TRADE_VALUE 
-    ]
-
-    # B. Filter by Ticker (Applies only if a ticker is entered in the form)
-    if filter_ticker:
-        trades_to_display = [
-            trade for trade in trades_to_display 
-            if trade.get('ticker', '').upper() == filter_ticker
-        ]
+    # --- 2. Get the filing-level data (grouped, filtered by minimum value and, if a
+    # ticker is entered in the form, by ticker via the cached index) ---
+    # This is cached across requests, so only the per-request steps run here. Copy
+    # it so sorting below never reorders the cache.
+    trades_to_display = list(get_display_filings(filter_ticker))
 
-    # --- 5. Apply Sorting Logic ---
+    # --- 3. Apply Sorting Logic ---
     if trades_to_display:
         # Determine the key to sort by and the reversal direction
         reverse_sort = sort_order == 'desc'
@@ -288,10 +893,11 @@ def dashboard():
             )
         else:
             # Sort by string keys (date, ticker, filer)
-            trades_to_display.sort(key=lambda x: x.get(sort_key, ''), reverse=reverse_sort)
+            trades_to_display.sort(key=lambda x: str(x.get(sort_key, '')), reverse=reverse_sort)
             
-        # Get the date of the most recent trade for the header banner (still using raw data)
-        latest_update_date = max([t.get('date', '0000-00-00') for t in all_trades]) if all_trades else 'N/A'
+        # Get the date of the most recent trade for the header banner (still using raw
+        # data; tracked as trades are stored rather than scanned per request)
+        latest_update_date = _LATEST_DATE or 'N/A'
     else:
         latest_update_date = 'N/A'
 
@@ -320,195 +926,108 @@ def dashboard():
         return 'text-yellow-400' 
 
 
-    # Helper to generate the new URL query string for sorting links
-    def get_sort_link(column_name):
-        # preserve the current filter if one exists
-        filter_param = f"&filter_ticker={filter_ticker}" if filter_ticker else ""
-
-        # Logic to toggle the sort order if the current column is clicked
-        current_sort_by = request.args.get('sort_by', 'date')
-        current_order = request.args.get('order', 'desc')
-
-        if column_name == current_sort_by:
-            # Toggle order: desc -> asc, asc -> desc
-            new_order = 'asc' if current_order == 'desc' else 'desc'
-        else:
-            # New column clicked, reset to default (descending)
-            new_order = 'desc'
+    # --- 4. Paginate: only the requested page's rows are built and rendered ---
+    page_size = min(get_positive_int_arg('page_size', DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+    total_filings = len(trades_to_display)
+    total_pages = max(1, math.ceil(total_filings / page_size))
+    page = min(get_positive_int_arg('page', 1), total_pages)
+    page_trades = trades_to_display[(page - 1) * page_size:page * page_size]
 
-        return f"/?sort_by={column_name}&order={new_order}{filter_param}"
-    
-    # Helper to generate the sort indicator for the header
-    def get_sort_indicator(column_name):
-        current_sort_by = request.args.get('sort_by', 'date')
-        current_order = request.args.get('order', 'desc')
+    # Header links and sort indicators, computed once from the already-read query args
+    preserved_params = {}
+    if filter_ticker:
+        preserved_params['filter_ticker'] = filter_ticker
+    page_size_param = request.args.get('page_size')
+    if page_size_param:
+        preserved_params['page_size'] = page_size_param
+    sort_links = {
+        column: get_sort_link(column, sort_by, sort_order, preserved_params)
+        for column in SORTABLE_COLUMNS
+    }
+    sort_indicators = {
+        column: get_sort_indicator(column, sort_by, sort_order)
+        for column in SORTABLE_COLUMNS
+    }
 
-        if column_name == current_sort_by:
-            return '▲' if current_order == 'asc' else '▼'
-        return ''
+    # Row values for templates/dashboard.html, which autoescapes them
+    trade_rows = []
+    for trade in page_trades:
+        # The trade object is now the aggregated filing record
+        code = trade.get('summary_code', 'N/A')
+        value = trade.get('total_value', 0.0) 
 
-    trade_rows = ""
-    
-    if trades_to_display:
-        for trade in trades_to_display:
-            # The trade object is now the aggregated filing record
-            ticker = trade.get('ticker', 'N/A')
-            company_name = trade.get('company_name', 'Company Name Missing')
-            filer_name = trade.get('filer', 'N/A')
-            person_title = trade.get('person_title', 'Title Missing') 
-            trade_date = trade.get('date', 'N/A')
-            code = trade.get('summary_code', 'N/A')
-            value = trade.get('total_value', 0.0) 
+        # Format the value for better readability
+        try:
+            formatted_value = f"${value:,.2f}"
+        except Exception:
+            formatted_value = "$N/A"
 
+        trade_rows.append({
             # Apply new color logic
-            row_class = get_bg_class(code)
-            text_color_class = get_text_class(code)
-
-            # Format the value for better readability
-            try:
-                formatted_value = f"${value:,.2f}"
-            except Exception:
-                formatted_value = "$N/A"
-                    
-            trade_rows += f"""
-            <tr class="{row_class} border-b border-gray-700 transition duration-150 ease-in-out">
-                <td class="px-4 py-3 font-semibold text-blue-300">{ticker}</td>
-                <td class="px-4 py-3 text-white">{company_name}</td>
-                <td class="px-4 py-3 text-gray-300">{filer_name}</td>
-                <td class="px-4 py-3 text-gray-400 text-sm italic">{person_title}</td>
-                <td class="px-4 py-3 whitespace-nowrap text-gray-400">{trade_date}</td>
-                <!-- Apply color and bolding to Value and Type -->
-                <td class="px-4 py-3 font-mono text-right text-lg font-bold {text_color_class}">{formatted_value}</td>
-                <td class="px-4 py-3 font-extrabold text-center {text_color_class}">{code}</td>
-            </tr>
-            """
-    else:
-        trade_rows = f"""
-        <tr>
-            <td colspan="7" class="p-4 text-center text-gray-500">
-                No trades found matching the minimum value filter (${MIN_TRADE_VALUE:,.2f}) 
-                and/or the ticker filter "{filter_ticker}".
-            </td>
-        </tr>
-        """
-        
+            'row_class': get_bg_class(code),
+            'text_color_class': get_text_class(code),
+            'ticker': trade.get('ticker', 'N/A'),
+            'company_name': trade.get('company_name', 'Company Name Missing'),
+            'filer_name': trade.get('filer', 'N/A'),
+            'person_title': trade.get('person_title', 'Title Missing'),
+            'trade_date': trade.get('date', 'N/A'),
+            'formatted_value': formatted_value,
+            'code': code,
+        })
 
-    html_template = f"""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>SEC Insider Trading Dashboard | Dark Mode</title>
-    <script src="https://cdn.tailwindcss.com"></script>
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700;900&display=swap');
-        body {{ 
-            font-family: 'Inter', sans-serif; 
-            background-color: #111827; /* Dark BG */
-            color: #d1d5db; /* Light text */
-        }}
-        .sortable-header:hover {{ cursor: pointer; color: #60a5fa; }}
-        .header-link {{ color: #9ca3af; }}
-        .header-link:hover {{ color: #e5e7eb; }}
-    </style>
-</head>
-<body>
-    <div class="container mx-auto p-4 sm:p-8">
-        <header class="text-center mb-10">
-            <h1 class="text-4xl font-extrabold text-white mb-2">Insider Trading Monitor</h1>
-            <p class="text-lg text-gray-400">Latest trades reported to the SEC (Updated via API)</p>
-            <div class="text-sm mt-4 p-2 inline-block rounded-full bg-blue-900/50 text-blue-300 font-medium border border-blue-800">
-                Latest Trade Date: {latest_update_date}
-            </div>
-            <p class="text-xs mt-2 text-gray-500">
-                Displaying trades greater than or equal to ${MIN_TRADE_VALUE:,.2f}
-            </p>
-        </header>
-        
-        <!-- Filter Form -->
-        <form method="GET" action="/" class="mb-6 flex flex-col sm:flex-row gap-3 sm:gap-4 p-4 bg-gray-900 shadow-2xl rounded-xl items-center border border-gray-700">
-            <!-- Hidden inputs to preserve sort state during filter -->
-            <input type="hidden" name="sort_by" value="{sort_by}">
-            <input type="hidden" name="order" value="{sort_order}">
-            
-            <label for="filter_ticker" class="text-gray-300 font-medium whitespace-nowrap w-full sm:w-auto text-left sm:text-center">Filter by Ticker:</label>
-            <input type="text" id="filter_ticker" name="filter_ticker" value="{filter_ticker}"
-                    placeholder="e.g., AAPL, TSLA" 
-                    class="flex-grow w-full p-3 border border-gray-600 bg-gray-800 text-white rounded-lg focus:ring-blue-500 focus:border-blue-500 uppercase transition duration-150">
-            <button type="submit" class="w-full sm:w-auto bg-blue-600 hover:bg-blue-500 text-white font-bold py-3 px-6 rounded-lg transition duration-150 shadow-lg shadow-blue-500/30">
-                Apply Filter
-            </button>
-            <a href="/" class="w-full sm:w-auto text-gray-400 hover:text-white py-3 px-6 text-center border border-gray-700 rounded-lg transition duration-150">
-                Clear
-            </a>
-        </form>
-            
-        <div class="shadow-2xl rounded-xl overflow-hidden bg-gray-900 border border-gray-800">
-            <div class="overflow-x-auto">
-                <table class="min-w-full divide-y divide-gray-700">
-                    <thead class="bg-gray-800">
-                        <tr>
-                            <!-- Clickable Headers for Sorting -->
-                            <th class="px-4 py-3 text-left text-xs font-medium text-gray-400 uppercase tracking-wider whitespace-nowrap">
-                                <a href="{get_sort_link('ticker')}" class="sortable-header header-link block">Ticker {get_sort_indicator('ticker')}</a>
-                            </th>
-                            <th class="px-4 py-3 text-left text-xs font-medium text-gray-400 uppercase tracking-wider whitespace-nowrap">
-                                <a href="{get_sort_link('company_name')}" class="sortable-header header-link block">Company {get_sort_indicator('company_name')}</a>
-                            </th>
-                            <th class="px-4 py-3 text-left text-xs font-medium text-gray-400 uppercase tracking-wider whitespace-nowrap">
-                                Insider Name
-                            </th>
-                            <th class="px-4 py-3 text-left text-xs font-medium text-gray-400 uppercase tracking-wider whitespace-nowrap">
-                                Title
-                            </th>
-                            <th class="px-4 py-3 text-left text-xs font-medium text-gray-400 uppercase tracking-wider whitespace-nowrap">
-                                <a href="{get_sort_link('date')}" class="sortable-header header-link block">Date {get_sort_indicator('date')}</a>
-                            </th>
-                            <th class="px-4 py-3 text-right text-xs font-medium text-gray-400 uppercase tracking-wider whitespace-nowrap">
-                                <a href="{get_sort_link('value')}" class="sortable-header header-link block">Value {get_sort_indicator('value')}</a>
-                            </th>
-                            <th class="px-4 py-3 text-center text-xs font-medium text-gray-400 uppercase tracking-wider whitespace-nowrap">
-                                Type
-                            </th>
-                        </tr>
-                    </thead>
-                    <tbody class="divide-y divide-gray-800">
-                        {trade_rows}
-                    </tbody>
-                </table>
-            </div>
-        </div>
-        
-        <footer class="mt-10 text-center text-sm text-gray-600">
-            Data provided by a mock SEC scraper and transmitted securely via API.
-        </footer>
-    </div>
-</body>
-</html>
-""" 
-    
-    return render_template_string(html_template)
+    return render_template(
+        'dashboard.html',
+        trades=trade_rows,
+        latest_update_date=latest_update_date,
+        min_value_label=f"${MIN_TRADE_VALUE:,.2f}",
+        sort_by=sort_by,
+        sort_order=sort_order,
+        filter_ticker=filter_ticker,
+        sort_links=sort_links,
+        sort_indicators=sort_indicators,
+        page=page,
+        total_pages=total_pages,
+        total_filings=total_filings,
+        page_size_param=page_size_param,
+        prev_page_link=get_page_link(page - 1) if page > 1 else None,
+        next_page_link=get_page_link(page + 1) if page < total_pages else None,
+    )
             
-def get_available_port(preferred=5000, host='127.0.0.1'):
-    """Return preferred port if it is free; otherwise return an ephemeral free port.
-    This tries to bind then release the socket to avoid port race for dev use only.
+def get_available_socket(preferred=5000, host='127.0.0.1'):
+    """Return (socket, port) bound to the preferred port if it is free, otherwise to an
+    ephemeral free port. The bound socket is handed to the server as-is, so no other
+    process can take the port between this check and the server starting.
     """
     import socket
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    try:
-        s.bind((host, preferred))
-        s.close()
-        return preferred
-    except OSError:
-        # Preferred is taken; get an ephemeral free port
-        s2 = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s2.bind((host, 0))
-        port = s2.getsockname()[1]
-        s2.close()
-        return port
+    for port in (preferred, 0):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Allow rebinding a port still in TIME_WAIT from a previous run (on Windows
+        # SO_REUSEADDR would instead allow sharing a port in active use)
+        if os.name != 'nt':
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind((host, port))
+            # Listen right away: a bound but idle SO_REUSEADDR socket would not stop
+            # another process binding the same port
+            s.listen()
+        except OSError:
+            # Preferred is taken; fall through to an ephemeral free port
+            s.close()
+            continue
+        return s, s.getsockname()[1]
+    raise OSError(f"Could not bind a port on {host}")
+
+# Worker threads for the production (waitress) server. The store and page cache
+# are per-process, so one process with several threads shares them; under gunicorn
+# the equivalent is: gunicorn -w 1 -k gthread --threads 8 --chdir src dashboard:app
+SERVER_THREADS = 8
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Insider trading dashboard server.")
+    parser.add_argument('--dev', action='store_true',
+                        help="Run Flask's single-threaded debug server instead of waitress.")
+    args = parser.parse_args()
+
     # Initialize the data file and ensure the directory exists
     try:
         # CRITICAL FIX: Ensure the directory exists before attempting any file operation.
@@ -517,11 +1036,14 @@ if __name__ == '__main__':
         if not os.path.exists(DATA_FILE):
             print(f"DIAGNOSTIC: Data file {DATA_FILE} not found. Creating empty file.")
             save_data([]) # This also calls ensure_data_directory_exists
+
+        # Load the trade store (and its dedup index) up front at startup
+        load_data()
     except Exception as e:
         print(f"FATAL ERROR during data file initialization: {e}", file=sys.stderr)
         sys.exit(1) # Exit if we cannot initialize the file system
 
-    print(f"--- Flask Server Starting ---")
+    print(f"--- Flask Server Starting ({'dev server' if args.dev else f'waitress, {SERVER_THREADS} threads'}) ---")
     
     # Allow env-var override and fallback to available ports for dev convenience
     host = os.environ.get('HOST', '127.0.0.1')
@@ -529,7 +1051,7 @@ if __name__ == '__main__':
     # Use 8000 as the new default preferred port
     preferred_port = int(env_port) if env_port else 8000 
     
-    port_to_use = get_available_port(preferred=preferred_port, host=host)
+    server_socket, port_to_use = get_available_socket(preferred=preferred_port, host=host)
 
     # Now we print the correct port being used
     print(f"Dashboard available at: http://127.0.0.1:{port_to_use}/")
@@ -542,4 +1064,13 @@ if __name__ == '__main__':
     if port_to_use != preferred_port:
         print(f"Port {preferred_port} in use; automatically starting on {port_to_use}")
         
-    app.run(host=host, port=port_to_use, debug=True, use_reloader=False) # use_reloader=False to prevent double execution
\ No newline at end of file
+    if args.dev:
+        # app.run cannot adopt an existing socket, so release it just before the dev
+        # server binds the same port again
+        server_socket.close()
+        app.run(host=host, port=port_to_use, debug=True, use_reloader=False) # use_reloader=False to prevent double execution
+    else:
+        # Imported here so importing this module (e.g. under gunicorn) doesn't need waitress
+        from waitress import serve
+        # waitress listens on the already-bound socket
+        serve(app, sockets=[server_socket], threads=SERVER_THREADS)
\ No newline at end of file
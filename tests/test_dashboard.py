@@ -0,0 +1,137 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import orjson
+
+os.environ.setdefault('DASHBOARD_API_KEY', 'test-key')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import dashboard  # noqa: E402
+
+
+def make_trade(i):
+    return {
+        'date': f"2024-01-{i % 28 + 1:02d}",
+        'ticker': f"T{i % 50}",
+        'filer': f"Filer {i}",
+        'code': 'P',
+        'shares': float(i),
+        'price': 10.0,
+        'value': f"${i * 10:,.2f}",
+        'accession': f"0000000000-24-{i:06d}",
+    }
+
+
+class CleanDataLegacyFileTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.temp_dir.name, 'trades.json')
+        self.original_data_file = dashboard.DATA_FILE
+        self.original_threshold = dashboard.PARTITIONED_DEDUP_THRESHOLD_BYTES
+        dashboard.DATA_FILE = self.data_file
+        with dashboard._STORE_LOCK:
+            dashboard.reset_store((), None)
+        dashboard.cache.clear()
+        self.client = dashboard.app.test_client()
+
+    def tearDown(self):
+        dashboard.DATA_FILE = self.original_data_file
+        dashboard.PARTITIONED_DEDUP_THRESHOLD_BYTES = self.original_threshold
+        with dashboard._STORE_LOCK:
+            dashboard.reset_store((), None)
+        self.temp_dir.cleanup()
+
+    def write_legacy_file(self):
+        trades = [make_trade(i) for i in range(2000)] + [make_trade(i) for i in range(500)]
+        with open(self.data_file, 'wb') as f:
+            f.write(orjson.dumps(trades))
+
+    def assert_cleaned_file(self):
+        with open(self.data_file, 'rb') as f:
+            lines = f.read().splitlines()
+        trades = [orjson.loads(line) for line in lines]
+        self.assertEqual(len(trades), 2000)
+        self.assertEqual(len({trade['accession'] for trade in trades}), 2000)
+        self.assertEqual(os.listdir(self.temp_dir.name), ['trades.json'])
+
+    def clean(self):
+        response = self.client.post('/api/clean_data', headers={'X-API-KEY': dashboard.DASHBOARD_API_KEY})
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        self.assertIn(b'Removed 500 duplicates', response.get_data())
+
+    def test_partitioned_cleanup_migrates_unloaded_legacy_file(self):
+        self.write_legacy_file()
+        dashboard.PARTITIONED_DEDUP_THRESHOLD_BYTES = 1
+        self.clean()
+        self.assert_cleaned_file()
+
+    def test_in_memory_cleanup_migrates_unloaded_legacy_file(self):
+        self.write_legacy_file()
+        self.clean()
+        self.assert_cleaned_file()
+
+
+class AddUniqueTradesTest(unittest.TestCase):
+    def setUp(self):
+        self.original_capacity = dashboard.SEEN_FILTER_MIN_CAPACITY
+        self.original_recent_limit = dashboard.RECENT_KEYS_LIMIT
+        # A tiny filter and recent set, so most lookups go through confirmation
+        dashboard.SEEN_FILTER_MIN_CAPACITY = 64
+        dashboard.RECENT_KEYS_LIMIT = 10
+        with dashboard._STORE_LOCK:
+            dashboard.reset_store((), None)
+
+    def tearDown(self):
+        dashboard.SEEN_FILTER_MIN_CAPACITY = self.original_capacity
+        dashboard.RECENT_KEYS_LIMIT = self.original_recent_limit
+        with dashboard._STORE_LOCK:
+            dashboard.reset_store((), None)
+
+    def test_matches_clean_data_deduplication(self):
+        trades = [make_trade(i) for i in range(3000)]
+        with dashboard._STORE_LOCK:
+            self.assertEqual(len(dashboard.add_unique_trades(trades[:1000])), 1000)
+            # Re-uploads of old trades, new trades, and an int/float spelling of a stored one
+            batch = trades[:1000] + trades[1000:] + trades[1000:] + [dict(trades[10], shares=10)]
+            added = dashboard.add_unique_trades(batch)
+
+        self.assertEqual(added, dashboard.deduplicate_trades(trades[1000:]))
+        self.assertEqual(len(dashboard._TRADES), 3000)
+
+
+class UploadTradesTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_data_file = dashboard.DATA_FILE
+        dashboard.DATA_FILE = os.path.join(self.temp_dir.name, 'trades.json')
+        with dashboard._STORE_LOCK:
+            dashboard.reset_store((), None)
+        self.client = dashboard.app.test_client()
+
+    def tearDown(self):
+        dashboard.DATA_FILE = self.original_data_file
+        with dashboard._STORE_LOCK:
+            dashboard.reset_store((), None)
+        self.temp_dir.cleanup()
+
+    def upload(self, trades):
+        return self.client.post('/api/upload_trades', json={'trades': trades},
+                                headers={'X-API-KEY': dashboard.DASHBOARD_API_KEY})
+
+    def test_failed_append_does_not_drop_retry(self):
+        trades = [make_trade(i) for i in range(10)]
+        with mock.patch.object(dashboard, 'append_data', side_effect=OSError(28, 'No space left on device')):
+            self.assertEqual(self.upload(trades).status_code, 500)
+
+        response = self.upload(trades)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Removed 0 duplicates', response.get_data())
+        with open(dashboard.DATA_FILE, 'rb') as f:
+            self.assertEqual(len(f.read().splitlines()), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()